@@ -7,7 +7,10 @@ Extracts car service receipt data from PDFs using OCR and pattern matching.
 import argparse
 import base64
 import json
+import mmap
+import os
 import re
+import sys
 import time
 from datetime import datetime
 from pathlib import Path
@@ -18,6 +21,21 @@ import pdf2image
 import pytesseract
 from PIL import Image
 
+try:
+    import orjson  # Optional: faster JSON parsing
+except ImportError:
+    orjson = None
+
+
+# Files at least this large are parsed straight from a memory map (same threshold as site.py)
+MMAP_JSON_THRESHOLD = 64 * 1024
+
+
+# Digest of this module; cached validation results are discarded whenever the validator changes
+with open(__file__, "rb") as _source:
+    VALIDATION_VERSION = hashlib.blake2b(_source.read(), digest_size=16).hexdigest()
+del _source
+
 
 class ReceiptExtractor:
     """Main extraction pipeline for processing receipt PDFs."""
@@ -34,6 +52,7 @@ class ReceiptExtractor:
         
         # Validation directories
         self.verified_dir = Path("verified")
+        self.validation_cache = Path(".validation_cache.json")
         
         # Finnish receipt patterns
         self.patterns = {
@@ -149,14 +168,17 @@ class ReceiptExtractor:
             r'(PIENTARVIKKEET|Small items)',
         ]
         
+        seen = set()
         for pattern in service_patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
+            for match in re.finditer(pattern, text, re.IGNORECASE):
                 desc = match.group(1)
-                if desc and desc not in descriptions:
+                if desc and desc not in seen:
+                    seen.add(desc)
                     descriptions.append(desc)
+                    if len(descriptions) == 10:  # Limit to 10 items
+                        return descriptions
         
-        return descriptions[:10]  # Limit to 10 items
+        return descriptions
     
     def process_pdf(self, pdf_path: Path) -> Dict[str, Any]:
         """Process a single PDF file through the extraction pipeline."""
@@ -447,97 +469,234 @@ class ReceiptExtractor:
         print("EXTRACTION SUMMARY")
         print("="*60)
         
-        successful = sum(1 for r in results_summary if r.get("success"))
+        # Partition the results in a single pass
+        incomplete = []
+        failed = []
+        for r in results_summary:
+            if r.get("error"):
+                failed.append(r)
+            elif not r.get("success"):
+                incomplete.append(r)
+        
         total = len(results_summary)
+        successful = total - len(incomplete) - len(failed)
         
         print(f"Successfully extracted: {successful}/{total} files")
         
         if successful < total:
             print("\nFiles with missing required fields:")
-            for r in results_summary:
-                if not r.get("success") and not r.get("error"):
-                    print(f"  - {r['file']}: missing {', '.join(r['missing_required'])}")
+            for r in incomplete:
+                print(f"  - {r['file']}: missing {', '.join(r['missing_required'])}")
             
             print("\nFiles with errors:")
-            for r in results_summary:
-                if r.get("error"):
-                    print(f"  - {r['file']}: {r['error']}")
+            for r in failed:
+                print(f"  - {r['file']}: {r['error']}")
 
 
     def find_test_cases(self, specific_pdf: str = None) -> List[str]:
         """Find all PDFs that have both extracted and verified data."""
         test_cases = []
         
-        if not self.verified_dir.exists():
+        try:
+            entries = os.scandir(self.verified_dir)
+        except FileNotFoundError:
             return test_cases
         
-        for verified_pdf_dir in self.verified_dir.iterdir():
-            if verified_pdf_dir.is_dir():
-                pdf_name = verified_pdf_dir.name
+        # DirEntry caches its type from the directory listing, saving a stat per entry
+        with entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                
+                pdf_name = entry.name
                 
                 # If specific PDF requested, only include that one
                 if specific_pdf and specific_pdf != pdf_name:
                     continue
                 
-                verified_json = verified_pdf_dir / "verified.json"
-                extracted_json = self.output_dir / pdf_name / "data.json"
+                verified_json = os.path.join(entry.path, "verified.json")
+                extracted_json = os.path.join(self.output_dir, pdf_name, "data.json")
                 
-                if verified_json.exists() and extracted_json.exists():
+                if os.path.isfile(verified_json) and os.path.isfile(extracted_json):
                     test_cases.append(pdf_name)
         
         return test_cases
     
+    def _load_json(self, path: Path) -> Dict[str, Any]:
+        """Load a JSON file, using orjson when available."""
+        with open(path, "rb") as f:
+            # Large files are parsed straight from a memory map, skipping the copy
+            if orjson is not None and os.fstat(f.fileno()).st_size >= MMAP_JSON_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                    return orjson.loads(view)
+            raw = f.read()
+        return self._parse_json(raw)
+    
+    def _parse_json(self, raw: bytes) -> Dict[str, Any]:
+        """Parse JSON bytes, using orjson when available."""
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw)
+    
     def compare_values(self, extracted_value, ground_truth_value) -> bool:
         """Compare two values - exact comparison only."""
-        return extracted_value == ground_truth_value
+        # Identity short-circuits the common case of shared small ints and interned strings
+        return extracted_value is ground_truth_value or extracted_value == ground_truth_value
+    
+    def _compile_step_config(self, step_config: dict) -> tuple:
+        """Return (fields, frozenset) for the required/warning/optional fields of a step config."""
+        return tuple(
+            (fields, frozenset(fields))
+            for fields in (
+                step_config.get("required_fields", []),
+                step_config.get("warning_if_missing", []),
+                step_config.get("optional_fields", []),
+            )
+        )
     
     def validate_step(self, step_name: str, extracted_data: dict, ground_truth: dict, step_config: dict):
         """Validate a single extraction step against ground truth."""
+        return self._validate_compiled(
+            step_name, extracted_data, ground_truth, self._compile_step_config(step_config)
+        )
+    
+    def _validate_compiled(self, step_name: str, extracted_data: dict, ground_truth: dict, compiled_config: tuple):
+        """Validate a step against a config already compiled by _compile_step_config."""
         errors = []
         warnings = []
         info_messages = []
         
-        required_fields = step_config.get("required_fields", [])
-        warning_fields = step_config.get("warning_if_missing", [])
-        optional_fields = step_config.get("optional_fields", [])
-        
-        # Check required fields
-        for field in required_fields:
-            if field not in extracted_data:
-                errors.append(f"{step_name}: REQUIRED field '{field}' not found")
-            elif field in ground_truth:
-                if not self.compare_values(extracted_data[field], ground_truth[field]):
+        extracted_keys = extracted_data.keys()
+        comparable = extracted_keys & ground_truth.keys()
+        
+        required, warning, optional = compiled_config
+        
+        # ((fields, field set), list for missing fields, missing message, incorrect value message)
+        checks = (
+            (required, errors,
+             "REQUIRED field '{}' not found", "REQUIRED field '{}' incorrect"),
+            (warning, warnings,
+             "WARNING field '{}' not found", "WARNING field '{}' has incorrect value"),
+            (optional, info_messages,
+             "Optional field '{}' not found", "Optional field '{}' has incorrect value"),
+        )
+        
+        for (fields, field_set), missing_messages, missing_text, incorrect_text in checks:
+            missing = field_set - extracted_keys
+            # Only fields present on both sides need a value comparison
+            incorrect = {
+                field for field in field_set & comparable
+                if not self.compare_values(extracted_data[field], ground_truth[field])
+            }
+            if not (missing or incorrect):
+                continue
+            
+            # Report in the order the fields are configured
+            for field in fields:
+                if field in missing:
+                    missing_messages.append(f"{step_name}: {missing_text.format(field)}")
+                elif field in incorrect:
                     errors.append(
-                        f"{step_name}: REQUIRED field '{field}' incorrect - "
+                        f"{step_name}: {incorrect_text.format(field)} - "
                         f"got {extracted_data[field]}, expected {ground_truth[field]}"
                     )
         
-        # Check warning fields
-        for field in warning_fields:
-            if field not in extracted_data:
-                warnings.append(f"{step_name}: WARNING field '{field}' not found")
-            elif field in ground_truth:
-                if not self.compare_values(extracted_data[field], ground_truth[field]):
-                    errors.append(
-                        f"{step_name}: WARNING field '{field}' has incorrect value - "
-                        f"got {extracted_data[field]}, expected {ground_truth[field]}"
-                    )
+        return errors, warnings, info_messages
+    
+    def _validate_pdf(self, pdf_name: str, extracted_json: dict, verified_json: dict):
+        """Validate one test case, returning its report lines and messages."""
+        pdf_errors = []
+        pdf_warnings = []
+        pdf_info = []
+        
+        ground_truth = verified_json["ground_truth"]
+        expected_extraction = verified_json["expected_extraction"]
+        
+        # Precompute the field sets of every step once, as the config is loaded
+        compiled_steps = {
+            step_name: self._compile_step_config(step_config)
+            for step_name, step_config in expected_extraction.items()
+        }
         
-        # Check optional fields
-        for field in optional_fields:
-            if field not in extracted_data:
-                info_messages.append(f"{step_name}: Optional field '{field}' not found")
-            elif field in ground_truth:
-                if not self.compare_values(extracted_data[field], ground_truth[field]):
-                    errors.append(
-                        f"{step_name}: Optional field '{field}' has incorrect value - "
-                        f"got {extracted_data[field]}, expected {ground_truth[field]}"
-                    )
+        lines = [f"\n📄 Testing: {pdf_name}", "-" * 40]
         
-        return errors, warnings, info_messages
+        # Check each processing step that was executed
+        for step in extracted_json.get("processing_steps", []):
+            step_name = step["step_name"]
+            
+            # Skip OCR step (no field validation needed)
+            if step_name == "ocr":
+                continue
+            
+            # Get extracted fields from this step
+            step_extracted = step.get("extracted_fields", {})
+            
+            # Get expectations for this step
+            if step_name in compiled_steps:
+                errors, warnings, info = self._validate_compiled(
+                    step_name, step_extracted, ground_truth, compiled_steps[step_name]
+                )
+                
+                pdf_errors.extend(errors)
+                pdf_warnings.extend(warnings)
+                pdf_info.extend(info)
+                
+                # Report step results
+                if step_extracted:
+                    lines.append(f"  {step_name}: {list(step_extracted.keys())}")
+                else:
+                    lines.append(f"  {step_name}: No fields extracted")
+        
+        # Validate the final merged data
+        final_data = extracted_json.get("final_data", {})
+        if "final_data" in compiled_steps:
+            errors, warnings, info = self._validate_compiled(
+                "final_data", final_data, ground_truth, compiled_steps["final_data"]
+            )
+            
+            pdf_errors.extend(errors)
+            pdf_warnings.extend(warnings)
+            pdf_info.extend(info)
+            
+            if final_data:
+                lines.append(f"  final_data: {list(final_data.keys())}")
+            else:
+                lines.append(f"  final_data: No final data")
+        
+        return lines, pdf_errors, pdf_warnings, pdf_info
     
-    def run_validation(self, specific_pdf: str = None):
-        """Run validation against ground truth data."""
+    def _validate_cached(self, pdf_name: str, cache: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Validate one test case unless it passed before with identical input files.
+        
+        With no cache (None) the test case is always validated.
+        """
+        extracted_raw = (self.output_dir / pdf_name / "data.json").read_bytes()
+        verified_raw = (self.verified_dir / pdf_name / "verified.json").read_bytes()
+        
+        hashes = None
+        if cache is not None:
+            hashes = [
+                VALIDATION_VERSION,
+                hashlib.blake2b(extracted_raw, digest_size=16).hexdigest(),
+                hashlib.blake2b(verified_raw, digest_size=16).hexdigest(),
+            ]
+            entry = cache.get(pdf_name)
+            if entry and entry.get("hashes") == hashes and entry.get("errors") == []:
+                return entry
+        
+        lines, errors, warnings, info = self._validate_pdf(
+            pdf_name, self._parse_json(extracted_raw), self._parse_json(verified_raw)
+        )
+        return {"hashes": hashes, "lines": lines, "errors": errors, "warnings": warnings, "info": info}
+    
+    def run_validation(self, specific_pdf: str = None, verbose: bool = False, use_cache: bool = True):
+        """Run validation against ground truth data.
+        
+        Per-receipt details are only reported when verbose is set; output is
+        written in whole blocks rather than line by line. Receipts that passed
+        on a previous run with unchanged data.json and verified.json are taken
+        from the validation cache instead of being revalidated.
+        """
         test_cases = self.find_test_cases(specific_pdf)
         
         if not test_cases:
@@ -552,102 +711,71 @@ class ReceiptExtractor:
         print(f"🧪 Running validation on {len(test_cases)} receipt(s)...")
         print("=" * 60)
         
+        cache = None
+        if use_cache:
+            try:
+                cache = self._load_json(self.validation_cache)
+            except (OSError, ValueError):
+                cache = {}
+        
         all_errors = []
         all_warnings = []
         all_info = []
         
         for pdf_name in test_cases:
-            # Load data
-            with open(self.output_dir / pdf_name / "data.json", 'r', encoding='utf-8') as f:
-                extracted_json = json.load(f)
-            with open(self.verified_dir / pdf_name / "verified.json", 'r', encoding='utf-8') as f:
-                verified_json = json.load(f)
+            entry = self._validate_cached(pdf_name, cache)
+            if cache is not None:
+                cache[pdf_name] = entry
+            # Tag messages with their owning PDF for the summary
+            all_errors.extend((pdf_name, error) for error in entry["errors"])
+            all_warnings.extend((pdf_name, warning) for warning in entry["warnings"])
+            all_info.extend((pdf_name, info_msg) for info_msg in entry["info"])
             
-            ground_truth = verified_json["ground_truth"]
-            expected_extraction = verified_json["expected_extraction"]
-            
-            print(f"\n📄 Testing: {pdf_name}")
-            print("-" * 40)
-            
-            # Check each processing step that was executed
-            for step in extracted_json.get("processing_steps", []):
-                step_name = step["step_name"]
-                
-                # Skip OCR step (no field validation needed)
-                if step_name == "ocr":
-                    continue
-                
-                # Get extracted fields from this step
-                step_extracted = step.get("extracted_fields", {})
-                
-                # Get expectations for this step
-                if step_name in expected_extraction:
-                    step_config = expected_extraction[step_name]
-                    errors, warnings, info = self.validate_step(
-                        step_name, step_extracted, ground_truth, step_config
-                    )
-                    
-                    all_errors.extend(errors)
-                    all_warnings.extend(warnings)
-                    all_info.extend(info)
-                    
-                    # Print step results
-                    if step_extracted:
-                        print(f"  {step_name}: {list(step_extracted.keys())}")
-                    else:
-                        print(f"  {step_name}: No fields extracted")
+            if not verbose:
+                continue
             
-            # Validate the final merged data
-            final_data = extracted_json.get("final_data", {})
-            if "final_data" in expected_extraction:
-                final_config = expected_extraction["final_data"]
-                errors, warnings, info = self.validate_step(
-                    "final_data", final_data, ground_truth, final_config
-                )
-                
-                all_errors.extend(errors)
-                all_warnings.extend(warnings)
-                all_info.extend(info)
-                
-                if final_data:
-                    print(f"  final_data: {list(final_data.keys())}")
-                else:
-                    print(f"  final_data: No final data")
+            lines = list(entry["lines"])
             
-            # Print validation results for this PDF
-            current_errors = [e for e in all_errors if pdf_name in e or any(x in e for x in ["final_data", "parsing", "llm_extraction"])]
-            current_warnings = [w for w in all_warnings if pdf_name in w or any(x in w for x in ["final_data", "parsing", "llm_extraction"])]
-            current_info = [i for i in all_info if pdf_name in i or any(x in i for x in ["final_data", "parsing", "llm_extraction"])]
+            # Print validation results for this PDF (messages are already kept per PDF)
+            if not (entry["errors"] or entry["warnings"] or entry["info"]):
+                lines.append("  ✅ All fields correctly extracted!")
             
-            if not (current_errors or current_warnings or current_info):
-                print("  ✅ All fields correctly extracted!")
+            sys.stdout.write("\n".join(lines) + "\n")
         
         # Print summary
-        print(f"\n{'=' * 60}")
-        print("📊 VALIDATION SUMMARY")
-        print("=" * 60)
-        print(f"Total PDFs tested: {len(test_cases)}")
+        lines = [
+            f"\n{'=' * 60}",
+            "📊 VALIDATION SUMMARY",
+            "=" * 60,
+            f"Total PDFs tested: {len(test_cases)}",
+        ]
         
         if all_errors:
-            print(f"\n❌ ERRORS ({len(all_errors)}):")
-            for error in all_errors:
-                print(f"  - {error}")
+            lines.append(f"\n❌ ERRORS ({len(all_errors)}):")
+            lines.extend(f"  - {pdf_name}: {error}" for pdf_name, error in all_errors)
         
         if all_warnings:
-            print(f"\n⚠️  WARNINGS ({len(all_warnings)}):")
-            for warning in all_warnings:
-                print(f"  - {warning}")
+            lines.append(f"\n⚠️  WARNINGS ({len(all_warnings)}):")
+            lines.extend(f"  - {pdf_name}: {warning}" for pdf_name, warning in all_warnings)
         
         if all_info:
-            print(f"\nℹ️  INFO ({len(all_info)}):")
-            for info_msg in all_info:
-                print(f"  - {info_msg}")
+            lines.append(f"\nℹ️  INFO ({len(all_info)}):")
+            lines.extend(f"  - {pdf_name}: {info_msg}" for pdf_name, info_msg in all_info)
         
         success = len(all_errors) == 0
         if success:
-            print(f"\n🎉 VALIDATION PASSED - All extractions are accurate!")
+            lines.append(f"\n🎉 VALIDATION PASSED - All extractions are accurate!")
         else:
-            print(f"\n💥 VALIDATION FAILED - {len(all_errors)} errors found")
+            lines.append(f"\n💥 VALIDATION FAILED - {len(all_errors)} errors found")
+        
+        sys.stdout.write("\n".join(lines) + "\n")
+        
+        if cache is not None:
+            try:
+                with open(self.validation_cache, "w", encoding="utf-8") as f:
+                    json.dump(cache, f, indent=2, ensure_ascii=False)
+            except OSError as e:
+                print(f"⚠️  Could not write validation cache: {e}")
         
         return success
 
@@ -678,6 +806,10 @@ def main():
     # Validation flag
     parser.add_argument("--validate", nargs="?", const="all", metavar="PDF_NAME",
                        help="Validate extraction results against ground truth (optional: specific PDF name)")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                       help="Show per-receipt details during validation")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Revalidate every receipt, ignoring the validation cache")
     
     args = parser.parse_args()
     
@@ -696,9 +828,10 @@ def main():
     # Handle validation mode
     if args.validate:
         if args.validate == "all":
-            success = extractor.run_validation()
+            success = extractor.run_validation(verbose=args.verbose, use_cache=not args.no_cache)
         else:
-            success = extractor.run_validation(specific_pdf=args.validate)
+            success = extractor.run_validation(specific_pdf=args.validate, verbose=args.verbose,
+                                               use_cache=not args.no_cache)
         return 0 if success else 1
     
     input_path = Path(args.input)
@@ -760,7 +893,10 @@ class LLMExtractor:
             response_text = llm_response.get("response", "")
             
             # Parse JSON from LLM response
-            extracted_data = json.loads(response_text)
+            if orjson is not None:
+                extracted_data = orjson.loads(response_text)
+            else:
+                extracted_data = json.loads(response_text)
             
             duration_ms = int((time.time() - start_time) * 1000)
             
@@ -1033,8 +1169,6 @@ def test_llm_extraction():
 
 
 if __name__ == "__main__":
-    import sys
-    
     # Check for test flags
     if len(sys.argv) > 1:
         if sys.argv[1] == "--test-llm":
@@ -7,20 +7,316 @@ Commands:
     python site.py serve       # Serve site locally
     python site.py clean       # Clean generated files
     python site.py validate    # Validate source data
+    python site.py package     # Bundle the generated site into site.zip
 """
 
 import os
+import re
 import sys
 import json
-import glob
+import mmap
 import shutil
+import gzip
+import hashlib
 import base64
+import zipfile
 import argparse
+import calendar
+import datetime
+import email.utils
 import http.server
-import socketserver
-from datetime import datetime, timedelta
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
 
+try:
+    import orjson  # Optional: faster JSON parsing and encoding
+except ImportError:
+    orjson = None
+
+try:
+    import brotli  # Optional: pre-compressed .br copies of static assets
+except ImportError:
+    brotli = None
+
+try:
+    from rcssmin import cssmin  # Optional: minify the generated CSS
+except ImportError:
+    cssmin = None
+
+try:
+    from rjsmin import jsmin  # Optional: minify the generated JavaScript
+except ImportError:
+    jsmin = None
+
+
+# Receipt dates are always plain ISO dates (YYYY-MM-DD)
+_DATE_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+
+
+def parse_date(text):
+    """Parse a YYYY-MM-DD string into a date, raising ValueError if invalid"""
+    match = _DATE_RE.fullmatch(text)
+    if match is None:
+        raise ValueError(f"time data {text!r} does not match format '%Y-%m-%d'")
+    year, month, day = match.groups()
+    return datetime.date(int(year), int(month), int(day))
+
+
+# Files at least this large are parsed straight from a memory map
+MMAP_JSON_THRESHOLD = 64 * 1024
+
+
+def load_json(path):
+    """Load a JSON file"""
+    with open(path, 'rb') as f:
+        if orjson is not None and os.fstat(f.fileno()).st_size >= MMAP_JSON_THRESHOLD:
+            # orjson reads the mapping in place, skipping the copy into a bytes object
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return orjson.loads(view)
+        raw = f.read()
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def write_json(path, data):
+    """Write data as indented UTF-8 JSON"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def write_parts(path, parts):
+    """Write a sequence of text chunks as UTF-8 without joining them first"""
+    with open(path, 'wb', buffering=1 << 20) as f:
+        f.writelines(part.encode('utf-8') for part in parts)
+
+
+def write_asset(path, content):
+    """Write a text asset plus pre-compressed .gz (and .br) copies for static serving"""
+    data = content.encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(data)
+    # mtime=0 keeps the .gz output identical across rebuilds
+    with open(f"{path}.gz", 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(f"{path}.br", 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def json_dumps(data):
+    """Serialize data to a compact UTF-8 JSON string"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(data, ensure_ascii=False)
+
+
+# Service table row, filled from a service record's pre-formatted fields
+SERVICE_ROW_TEMPLATE = """
+                        <tr onclick="openReceipt('%(date)s', '%(_receipt_key)s')" class="%(_row_class)s" title="%(_row_title)s">
+                            <td>%(date)s%(_row_indicator)s</td>
+                            <td>%(_row_company)s</td>
+                            <td>%(_odometer_str)s</td>
+                            <td>%(_amount_str)s</td>
+                            <td>%(_row_invoice)s</td>
+                            <td class="source-file">%(original_filename)s</td>
+                        </tr>"""
+
+
+# Receipt page fields: (label, ground truth key, service record key of the displayed value)
+RECEIPT_FIELDS = (
+    ('Date', 'date', 'date'),
+    ('Company', 'company', 'company'),
+    ('Amount', 'amount', '_amount_str'),
+    ('VAT Amount', 'vat_amount', '_vat_str'),
+    ('Odometer', 'odometer_km', '_odometer_str'),
+    ('Invoice Number', 'invoice_number', 'invoice_number'),
+)
+
+OVERRIDE_BADGE = ' <span class="override-badge">Fixed</span>'
+
+# Static receipt page fragments, emitted as-is between the formatted parts
+OVERRIDE_LIST_START = """
+                    <ul>"""
+
+VERIFIED_DATA_START = """
+            <div class="verified-data">
+                <h2>Verified Service Data</h2>
+                <div class="field-grid">"""
+
+# The banner always runs straight into the verified data section
+OVERRIDE_BANNER_END = """
+                    </ul>
+                </details>
+            </div>""" + VERIFIED_DATA_START
+
+VERIFIED_DATA_END = """
+                </div>
+            </div>
+"""
+
+PROCESSING_STEPS_START = """
+            <details class="processing-steps">
+                <summary>Processing Details</summary>
+                <div class="steps-list">
+"""
+
+PROCESSING_STEPS_END = """
+                </div>
+            </details>
+"""
+
+RECEIPT_BODY_END = """
+        </div>
+    </main>"""
+
+RECEIPT_PAGE_END = """
+</body>
+</html>"""
+
+
+# Below this many receipt pages, worker startup costs more than rendering in-process
+PARALLEL_RENDER_MIN_PAGES = 200
+
+# Fingerprinted asset name (name.<sha1[:8]>.ext), optionally with a pre-compressed suffix
+FINGERPRINTED_ASSET_RE = re.compile(r'^(.+\.[0-9a-f]{8}\.[^.]+?)(?:\.gz|\.br)?$')
+
+# Files that deflate cannot shrink further, stored as-is by package_site
+ALREADY_COMPRESSED_SUFFIXES = ('.gz', '.br', '.pdf')
+
+# Digest of this module; receipt pages are re-rendered whenever the rendering code changes
+with open(__file__, 'rb') as _source:
+    RENDER_VERSION = hashlib.sha256(_source.read()).hexdigest()
+del _source
+
+
+@lru_cache(maxsize=4096, typed=True)
+def render_field(label, value, overridden):
+    """Render one receipt field; companies, dates and amounts repeat across receipts"""
+    if overridden:
+        field_class, override_badge = ' field-overridden', OVERRIDE_BADGE
+    else:
+        field_class = override_badge = ''
+    return f"""
+                    <div class="field-item{field_class}">
+                        <label>{label}:{override_badge}</label>
+                        <span>{value}</span>
+                    </div>"""
+
+
+def moving_average_3yr(series, ndigits):
+    """3-year moving average of a {year: value} series, keyed by each window's last year"""
+    years = sorted(series)
+    values = [series[year] for year in years]
+    return {
+        year: round((first + second + third) / 3, ndigits)
+        for year, first, second, third in zip(years[2:], values, values[1:], values[2:])
+    }
+
+
+def link_or_copy(src, dest):
+    """Hardlink src to dest, falling back to a plain copy across filesystems"""
+    try:
+        os.unlink(dest)
+    except FileNotFoundError:
+        pass
+    
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+def parse_accept_encoding(header):
+    """Parse an Accept-Encoding header into a {coding: q-value} dict"""
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+class PrecompressedRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Serve the build's .br/.gz copies of static files to clients that accept them"""
+    
+    encodings = (("br", ".br"), ("gzip", ".gz"))
+    
+    def send_head(self):
+        path = self.translate_path(self.path)
+        self.vary_encoding = False
+        if not os.path.isdir(path):
+            accepted = parse_accept_encoding(self.headers.get("Accept-Encoding", ""))
+            for encoding, suffix in self.encodings:
+                if not os.path.isfile(path + suffix):
+                    continue
+                # Responses differ by Accept-Encoding whenever a compressed copy exists
+                self.vary_encoding = True
+                if accepted.get(encoding, accepted.get("*", 0)) > 0:
+                    return self.send_compressed(path, path + suffix, encoding)
+        return super().send_head()
+    
+    def end_headers(self):
+        if getattr(self, "vary_encoding", False):
+            self.send_header("Vary", "Accept-Encoding")
+        super().end_headers()
+    
+    def send_compressed(self, path, compressed_path, encoding):
+        f = open(compressed_path, 'rb')
+        try:
+            fs = os.fstat(f.fileno())
+            if self.not_modified_since(fs.st_mtime):
+                self.send_response(http.HTTPStatus.NOT_MODIFIED)
+                self.end_headers()
+                f.close()
+                return None
+            
+            self.send_response(200)
+            self.send_header("Content-Type", self.guess_type(path))
+            self.send_header("Content-Encoding", encoding)
+            self.send_header("Content-Length", str(fs.st_size))
+            self.send_header("Last-Modified", self.date_time_string(fs.st_mtime))
+            self.end_headers()
+            return f
+        except Exception:
+            f.close()
+            raise
+    
+    def not_modified_since(self, mtime):
+        """Check If-Modified-Since the same way SimpleHTTPRequestHandler.send_head does"""
+        if "If-Modified-Since" not in self.headers or "If-None-Match" in self.headers:
+            return False
+        try:
+            ims = email.utils.parsedate_to_datetime(self.headers["If-Modified-Since"])
+        except (TypeError, IndexError, OverflowError, ValueError):
+            return False
+        
+        if ims.tzinfo is None:
+            ims = ims.replace(tzinfo=datetime.timezone.utc)
+        if ims.tzinfo is not datetime.timezone.utc:
+            return False
+        
+        last_modified = datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc)
+        return last_modified.replace(microsecond=0) <= ims
+
 
 class ServiceHistorySiteManager:
     def __init__(self):
@@ -28,7 +324,14 @@ class ServiceHistorySiteManager:
         self.extracted_dir = "extracted/"
         self.receipts_dir = "receipts/"
         self.site_dir = "site/"
+        self.templates_dir = "templates/"
+        self.vendor_dir = "vendor/"
         self.service_data = []
+        self._pdf_entries = None
+        self._analytics_json = None
+        self.asset_names = {}  # Logical asset name -> fingerprinted file name
+        self.chart_js_integrity = None
+        self.single_page = False  # Link receipts as sections of receipts/all.html
         
         # Statistics Finland fuel prices (€/liter)
         self.fuel_prices_finland = {
@@ -41,24 +344,28 @@ class ServiceHistorySiteManager:
         # Honda CR-V consumption assumption
         self.consumption_l_per_100km = 8.5
 
-    def build_site(self, force=False):
+    def build_site(self, force=False, single_page=False):
         """Main build process"""
         print("🚀 Building Car Service History Site...")
+        self.single_page = single_page
         
         if force and os.path.exists(self.site_dir):
             print(f"🧹 Cleaning existing site directory...")
             shutil.rmtree(self.site_dir)
         
-        if not self.validate_source_data():
+        # Validation happens while loading, so each receipt is read only once
+        receipts = self.load_receipts()
+        if not receipts:
             print("❌ Validation failed. Cannot build site.")
             return False
             
         self.create_site_structure()
-        self.process_and_rename_files()
+        self.process_and_rename_files(receipts)
+        # Assets first, so pages can link to their fingerprinted names
+        self.copy_static_assets()
         analytics = self.calculate_analytics()
         self.generate_main_page(analytics)
         self.generate_receipt_pages()
-        self.copy_static_assets()
         
         print(f"✅ Static site generated in {self.site_dir}")
         print("🌐 Serve with: python site.py serve")
@@ -66,45 +373,46 @@ class ServiceHistorySiteManager:
 
     def validate_source_data(self):
         """Validate source data with date checking"""
+        return len(self.load_receipts()) > 0
+
+    def load_receipts(self):
+        """Load and validate all receipts, reporting the ones excluded from the site"""
         print("🔍 Validating source data...")
         
-        valid_count = 0
-        invalid_count = 0
-        
-        pdf_files = glob.glob(f"{self.receipts_dir}*.pdf")
+        pdf_files = list(self._iter_receipt_pdfs())
         if not pdf_files:
             print(f"❌ No PDF files found in {self.receipts_dir}")
-            return False
-        
-        for pdf_file in pdf_files:
-            pdf_basename = os.path.basename(pdf_file)
-            verified_path = f"{self.verified_dir}{pdf_basename}/verified.json"
-            
-            if not os.path.exists(verified_path):
-                print(f"⚠️  Warning: No verified.json for {pdf_basename}")
-                invalid_count += 1
-                continue
-                
+            return []
+        
+        # Receipts are independent, so load them concurrently (mostly file I/O)
+        with ThreadPoolExecutor() as executor:
+            results = list(executor.map(self.load_receipt, pdf_files))
+        
+        receipts = []
+        for receipt, message in results:
+            if message:
+                print(message)
+            if receipt is not None:
+                receipts.append(receipt)
+        
+        invalid_count = len(results) - len(receipts)
+        print(f"📊 Validation complete: {len(receipts)} valid, {invalid_count} invalid receipts")
+        return receipts
+
+    def _iter_receipt_pdfs(self):
+        """Yield (path, basename) for each receipt PDF, scanning the directory only once"""
+        if self._pdf_entries is None:
+            self._pdf_entries = []
             try:
-                # Use the same loading mechanism to get merged data
-                data = self.load_service_data_with_overrides(pdf_basename)
-                    
-                date = data.get("ground_truth", {}).get("date")
-                if not date:
-                    print(f"❌ Error: No date in verified.json for {pdf_basename} - EXCLUDING from site")
-                    invalid_count += 1
-                    continue
-                    
-                # Validate date format
-                datetime.strptime(date, "%Y-%m-%d")
-                valid_count += 1
-                
-            except (json.JSONDecodeError, ValueError) as e:
-                print(f"❌ Error processing {pdf_basename}: {e} - EXCLUDING from site")
-                invalid_count += 1
-                
-        print(f"📊 Validation complete: {valid_count} valid, {invalid_count} invalid receipts")
-        return valid_count > 0
+                with os.scandir(self.receipts_dir) as entries:
+                    for entry in entries:
+                        if (entry.name.endswith('.pdf') and not entry.name.startswith('.')
+                                and entry.is_file()):
+                            self._pdf_entries.append((entry.path, entry.name))
+            except FileNotFoundError:
+                pass
+        
+        return iter(self._pdf_entries)
 
     def create_site_structure(self):
         """Create site directory structure"""
@@ -126,17 +434,17 @@ class ServiceHistorySiteManager:
         """Load verified data and apply overrides if they exist"""
         verified_path = f"{self.verified_dir}{pdf_basename}/verified.json"
         
-        with open(verified_path, 'r', encoding='utf-8') as f:
-            verified_data = json.load(f)
+        verified_data = load_json(verified_path)
         
-        # Check for override.json
+        # Check for override.json (opened directly; most receipts have none)
         override_path = f"{self.verified_dir}{pdf_basename}/override.json"
         overridden_fields = {}
+        try:
+            override_data = load_json(override_path)
+        except FileNotFoundError:
+            override_data = None
         
-        if os.path.exists(override_path):
-            with open(override_path, 'r', encoding='utf-8') as f:
-                override_data = json.load(f)
-            
+        if override_data is not None:
             # Store original values and apply overrides
             original_ground_truth = verified_data["ground_truth"].copy()
             override_ground_truth = override_data.get("ground_truth", {})
@@ -165,107 +473,174 @@ class ServiceHistorySiteManager:
         
         return verified_data
 
-    def process_and_rename_files(self):
+    def load_receipt(self, pdf_entry):
+        """Load and validate verified and extraction data for one receipt PDF
+        
+        Returns (receipt, message); receipt is None if the PDF is excluded,
+        and message is a warning or error to report.
+        """
+        pdf_file, pdf_basename = pdf_entry
+        
+        try:
+            # Load verified data with overrides applied
+            try:
+                verified_data = self.load_service_data_with_overrides(pdf_basename)
+            except FileNotFoundError:
+                return None, f"⚠️  Warning: No verified.json for {pdf_basename}"
+            
+            date = verified_data.get("ground_truth", {}).get("date")
+            if not date:
+                return None, f"❌ Error: No date in verified.json for {pdf_basename} - EXCLUDING from site"
+            
+            # Validate date format
+            date_obj = parse_date(date)
+            
+            # Load extraction data if available
+            extracted_path = f"{self.extracted_dir}{pdf_basename}/data.json"
+            try:
+                extracted_mtime_ns = os.stat(extracted_path).st_mtime_ns
+            except FileNotFoundError:
+                extraction_data = extracted_mtime_ns = None
+            else:
+                extraction_data = load_json(extracted_path)
+            
+            receipt = (pdf_file, pdf_basename, verified_data, date_obj, extraction_data, extracted_mtime_ns)
+            return receipt, None
+        
+        except Exception as e:
+            return None, f"❌ Error processing {pdf_basename}: {e} - EXCLUDING from site"
+
+    def copy_receipt_files(self, job):
+        """Copy the renamed PDF and write OCR text for one service record"""
+        pdf_file, date, service_record, extracted_mtime_ns = job
+        
+        try:
+            # Copy and rename PDF
+            link_or_copy(pdf_file, f"{self.site_dir}pdfs/{date}.pdf")
+            
+            # Process OCR data if available
+            self.process_ocr_data(service_record, date, extracted_mtime_ns)
+        
+        except Exception as e:
+            print(f"⚠️  Error processing {service_record['original_filename']}: {e}")
+
+    def process_and_rename_files(self, receipts):
         """Process files and rename using dates from verified.json"""
         print("📄 Processing and renaming files...")
         
         self.service_data = []
-        date_conflicts = {}
+        date_counts = {}
         
-        for pdf_file in glob.glob(f"{self.receipts_dir}*.pdf"):
-            pdf_basename = os.path.basename(pdf_file)
+        copy_jobs = []
+        for receipt in receipts:
+            pdf_file, pdf_basename, verified_data, date_obj, extraction_data, extracted_mtime_ns = receipt
+            original_date = verified_data["ground_truth"]["date"]
             
-            # Skip if no verified.json (already warned in validation)
-            verified_path = f"{self.verified_dir}{pdf_basename}/verified.json"
-            if not os.path.exists(verified_path):
-                continue
-                
-            try:
-                # Load verified data with overrides applied
-                verified_data = self.load_service_data_with_overrides(pdf_basename)
-                    
-                date = verified_data.get("ground_truth", {}).get("date")
-                if not date:
-                    continue
-                    
-                # Handle date conflicts (multiple receipts on same date)
-                original_date = date
-                counter = 1
-                while date in date_conflicts:
-                    counter += 1
-                    date = f"{original_date}-{counter}"
-                    
-                date_conflicts[date] = pdf_basename
-                
-                # Create service record
-                ground_truth = verified_data.get("ground_truth", {})
-                service_record = {
-                    "date": date,
-                    "original_filename": pdf_basename,
-                    "renamed_filename": f"{date}.pdf",
-                    "verified_data": verified_data,
-                    **ground_truth
-                }
-                
-                # Load extraction data if available
-                extracted_path = f"{self.extracted_dir}{pdf_basename}/data.json"
-                if os.path.exists(extracted_path):
-                    with open(extracted_path, 'r', encoding='utf-8') as f:
-                        service_record["extraction_data"] = json.load(f)
-                
-                self.service_data.append(service_record)
-                
-                # Copy and rename PDF
-                shutil.copy2(pdf_file, f"{self.site_dir}pdfs/{date}.pdf")
-                
-                # Process OCR data if available
-                self.process_ocr_data(service_record, date)
-                
-            except Exception as e:
-                print(f"⚠️  Error processing {pdf_basename}: {e}")
-                continue
+            # Handle date conflicts (multiple receipts on same date)
+            count = date_counts.get(original_date, 0) + 1
+            date_counts[original_date] = count
+            date = original_date if count == 1 else f"{original_date}-{count}"
+            
+            # Create service record
+            ground_truth = verified_data.get("ground_truth", {})
+            service_record = {
+                "date": date,
+                "original_filename": pdf_basename,
+                "renamed_filename": f"{date}.pdf",
+                "override_info": verified_data.get("override_info", {}),
+                **ground_truth
+            }
+            
+            if extraction_data is not None:
+                service_record["extraction_data"] = extraction_data
+            
+            # Keep the parsed date for analytics (build-time only fields)
+            service_record["_date_obj"] = date_obj
+            service_record["_year"] = date_obj.year
+            # Unique per record, unlike "date" when several receipts share a day
+            service_record["_receipt_key"] = date
+            
+            self.add_display_fields(service_record)
+            self.service_data.append(service_record)
+            copy_jobs.append((pdf_file, date, service_record, extracted_mtime_ns))
+        
+        # Copy PDFs and write OCR text concurrently
+        with ThreadPoolExecutor() as executor:
+            list(executor.map(self.copy_receipt_files, copy_jobs))
         
         # Sort by date
-        self.service_data.sort(key=lambda x: x["date"])
+        self.service_data.sort(key=itemgetter("date"))
         
-        # Save processed data
-        with open(f"{self.site_dir}data/service-history.json", "w", encoding='utf-8') as f:
-            json.dump(self.service_data, f, indent=2, ensure_ascii=False)
+        # Save processed data (underscore fields are build-time only)
+        public_data = [
+            {key: value for key, value in service.items() if not key.startswith('_')}
+            for service in self.service_data
+        ]
+        write_json(f"{self.site_dir}data/service-history.json", public_data)
             
         print(f"📊 Processed {len(self.service_data)} valid service records")
 
-    def process_ocr_data(self, service_record, date):
-        """Extract and decode OCR data"""
+    def add_display_fields(self, service_record):
+        """Pre-format display strings once so every page can reuse them"""
+        odometer_km = service_record.get('odometer_km')
+        amount = service_record.get('amount')
+        vat_amount = service_record.get('vat_amount')
+        
+        service_record['_odometer_str'] = f"{odometer_km:,} km" if odometer_km else "N/A"
+        service_record['_amount_str'] = f"€{amount:,.2f}" if amount else "N/A"
+        service_record['_vat_str'] = f"€{vat_amount:,.2f}" if vat_amount else "N/A"
+        
+        # Service table row fields, including the override indicator
+        override_info = service_record.get('override_info', {})
+        has_overrides = override_info.get('has_overrides', False)
+        service_record['_row_class'] = 'clickable-row has-overrides' if has_overrides else 'clickable-row'
+        service_record['_row_title'] = 'Has manual corrections' if has_overrides else ''
+        service_record['_row_indicator'] = ' 🔧' if has_overrides else ''
+        service_record['_row_company'] = service_record.get('company', 'Unknown')
+        service_record['_row_invoice'] = service_record.get('invoice_number', 'N/A')
+
+    def process_ocr_data(self, service_record, date, source_mtime_ns=None):
+        """Extract and decode OCR data, skipping it when the text file is up to date"""
+        ocr_path = f"{self.site_dir}data/ocr/{date}.txt"
+        
+        # The text file is stamped with the mtime of the data.json it came from
+        if source_mtime_ns is not None:
+            try:
+                if os.stat(ocr_path).st_mtime_ns == source_mtime_ns:
+                    return
+            except FileNotFoundError:
+                pass
+        
         extraction_data = service_record.get("extraction_data", {})
         
         for step in extraction_data.get("processing_steps", []):
             if step.get("step_name") == "ocr":
                 ocr_text = step.get("output", {}).get("text", "")
                 if ocr_text:
+                    tmp_path = f"{ocr_path}.tmp"
                     try:
-                        # Decode base64 OCR text
-                        decoded_text = base64.b64decode(ocr_text).decode('utf-8')
-                        # Save as text file
-                        with open(f"{self.site_dir}data/ocr/{date}.txt", "w", encoding='utf-8') as f:
-                            f.write(decoded_text)
+                        # Decode base64 OCR text, check it is valid UTF-8 and save the bytes as-is
+                        decoded_bytes = base64.b64decode(ocr_text)
+                        decoded_bytes.decode('utf-8')
+                        with open(tmp_path, "wb") as f:
+                            f.write(decoded_bytes)
+                        if source_mtime_ns is not None:
+                            os.utime(tmp_path, ns=(source_mtime_ns, source_mtime_ns))
+                        os.replace(tmp_path, ocr_path)
                     except Exception as e:
                         print(f"⚠️  Warning: Could not decode OCR for {date}: {e}")
+                        try:
+                            os.unlink(tmp_path)
+                        except FileNotFoundError:
+                            pass
                 break
 
     def calculate_analytics(self):
         """Calculate comprehensive analytics"""
         print("📊 Calculating analytics...")
         
-        # Group by year
-        yearly_data = {}
-        for service in self.service_data:
-            year = service['date'][:4]
-            if year not in yearly_data:
-                yearly_data[year] = []
-            yearly_data[year].append(service)
-        
         # Calculate maintenance costs
-        maintenance = self.calculate_maintenance_costs(yearly_data)
+        maintenance = self.calculate_maintenance_costs()
         
         # Calculate mileage
         mileage = self.calculate_yearly_mileage()
@@ -283,52 +658,40 @@ class ServiceHistorySiteManager:
             "summary": summary
         }
         
-        # Save analytics data
-        with open(f"{self.site_dir}data/analytics.json", "w", encoding='utf-8') as f:
-            json.dump(analytics, f, indent=2, ensure_ascii=False)
+        # Save analytics data, and encode it once for embedding in the main page
+        write_json(f"{self.site_dir}data/analytics.json", analytics)
+        self._analytics_json = json_dumps(analytics)
         
         return analytics
 
-    def calculate_maintenance_costs(self, yearly_data):
+    def calculate_maintenance_costs(self):
         """Calculate maintenance cost analytics with moving averages"""
-        # First, determine the full year range
-        if not yearly_data:
+        # Sum costs per year in a single pass
+        totals = Counter()
+        for service in self.service_data:
+            totals[service['_year']] += service.get('amount', 0) or 0
+        
+        if not totals:
             return {"yearly_costs": {}, "moving_average_3yr": {}}
         
-        year_keys = [int(year) for year in yearly_data.keys()]
-        start_year = min(year_keys)
-        end_year = max(year_keys)
+        start_year = min(totals)
+        end_year = max(totals)
         
-        # Initialize all years in range with 0 cost
+        # Every year in range is included, with 0 cost where there was no service
         yearly_costs = {}
         for year in range(start_year, end_year + 1):
-            yearly_costs[str(year)] = 0.0
-        
-        # Fill in actual costs where we have data
-        for year, services in yearly_data.items():
-            total_cost = sum(s.get('amount', 0) or 0 for s in services)
-            yearly_costs[year] = round(total_cost, 2)
-        
-        # Calculate 3-year moving average (including zero years)
-        years = sorted(yearly_costs.keys())
-        moving_avg = {}
-        
-        for i, year in enumerate(years):
-            if i >= 2:  # Need at least 3 years
-                prev_years = years[i-2:i+1]
-                avg_cost = sum(yearly_costs[y] for y in prev_years) / 3
-                moving_avg[year] = round(avg_cost, 2)
+            yearly_costs[str(year)] = round(totals[year], 2) if year in totals else 0.0
         
         return {
             "yearly_costs": yearly_costs,
-            "moving_average_3yr": moving_avg
+            # 3-year moving average (including zero years)
+            "moving_average_3yr": moving_average_3yr(yearly_costs, 2)
         }
 
     def calculate_yearly_mileage(self):
         """Calculate yearly mileage from odometer readings"""
-        # Get services with odometer readings, sorted by date
+        # Get services with odometer readings (service_data is already sorted by date)
         services_with_odo = [s for s in self.service_data if s.get('odometer_km')]
-        services_with_odo.sort(key=lambda x: x['date'])
         
         yearly_km = {}
         
@@ -345,7 +708,7 @@ class ServiceHistorySiteManager:
             if km_driven > 0:
                 # Distribute km proportionally across years
                 self.distribute_km_across_years(
-                    previous['date'], current['date'], km_driven, yearly_km
+                    previous['_date_obj'], current['_date_obj'], km_driven, yearly_km
                 )
         
         # Fill in missing years with interpolated values
@@ -374,45 +737,39 @@ class ServiceHistorySiteManager:
                     else:
                         yearly_km[year_str] = 0
         
-        # Calculate 3-year moving averages
-        years = sorted(yearly_km.keys())
-        moving_avg = {}
-        
-        for i, year in enumerate(years):
-            if i >= 2:
-                avg = sum(yearly_km[years[j]] for j in range(i-2, i+1)) / 3
-                moving_avg[year] = round(avg, 0)
-        
         return {
             "yearly": yearly_km,
-            "moving_average_3yr": moving_avg
+            "moving_average_3yr": moving_average_3yr(yearly_km, 0)
         }
 
-    def distribute_km_across_years(self, start_date, end_date, km_driven, yearly_km):
+    def distribute_km_across_years(self, start, end, km_driven, yearly_km):
         """Distribute kilometers proportionally across years"""
-        start = datetime.strptime(start_date, "%Y-%m-%d")
-        end = datetime.strptime(end_date, "%Y-%m-%d")
-        total_days = (end - start).days
+        # Work on day ordinals so each year boundary is plain integer math
+        start_ord = start.toordinal()
+        end_ord = end.toordinal()
+        total_days = end_ord - start_ord
         
         if total_days <= 0:
             return
         
-        current_date = start
-        while current_date.year <= end.year:
-            year = str(current_date.year)
+        # Ordinal of 1 January of the current year, advanced by the year's length
+        year_first = start_ord - start.timetuple().tm_yday + 1
+        
+        for year_int in range(start.year, end.year + 1):
+            year = str(year_int)
+            next_year_first = year_first + (366 if calendar.isleap(year_int) else 365)
             
             # Calculate days in this year for this period
-            year_start = max(current_date, datetime(current_date.year, 1, 1))
-            year_end = min(end, datetime(current_date.year, 12, 31))
+            year_start = max(start_ord, year_first)
+            year_end = min(end_ord, next_year_first - 1)
+            year_first = next_year_first
             
             if year_start <= year_end:
-                days_in_year = (year_end - year_start).days + 1
+                days_in_year = year_end - year_start + 1
                 proportion = days_in_year / total_days
                 km_for_year = km_driven * proportion
                 
                 yearly_km[year] = yearly_km.get(year, 0) + round(km_for_year, 0)
-            
-            current_date = datetime(current_date.year + 1, 1, 1)
 
     def estimate_fuel_costs(self, mileage_data):
         """Estimate fuel costs based on mileage and historical prices"""
@@ -458,9 +815,10 @@ class ServiceHistorySiteManager:
         }
         
         if odometer_readings:
+            total_km = max(odometer_readings) - min(odometer_readings)
             summary.update({
-                "total_km": max(odometer_readings) - min(odometer_readings),
-                "cost_per_km": round(total_cost / (max(odometer_readings) - min(odometer_readings)), 4) if max(odometer_readings) > min(odometer_readings) else 0
+                "total_km": total_km,
+                "cost_per_km": round(total_cost / total_km, 4) if total_km > 0 else 0
             })
         
         return summary
@@ -469,21 +827,25 @@ class ServiceHistorySiteManager:
         """Generate the main index.html page"""
         print("🏠 Generating main page...")
         
-        html_content = f"""<!DOCTYPE html>
+        summary = analytics['summary']
+        analytics_json = self._analytics_json or json_dumps(analytics)
+        receipt_links = "\n        window.singlePageReceipts = true;" if self.single_page else ""
+        
+        parts = [f"""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Honda CR-V Service History</title>
-    <link rel="stylesheet" href="assets/style.css">
-    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+    <link rel="stylesheet" href="assets/{self.asset_url('style.css')}">
+    {self.chart_js_tag()}
 </head>
 <body>
     <header class="site-header">
         <div class="container">
             <div class="car-info">
                 <div class="car-image-placeholder">
-                    <img src="assets/car-placeholder.jpg" alt="Honda CR-V" onerror="this.style.display='none';">
+                    <img src="assets/{self.asset_url('car-placeholder.svg')}" alt="Honda CR-V" onerror="this.style.display='none'; this.nextElementSibling.style.display='block';">
                     <div class="car-image-fallback">🚗</div>
                 </div>
                 <div class="car-details">
@@ -498,22 +860,22 @@ class ServiceHistorySiteManager:
         <section class="summary-cards">
             <div class="stat-card">
                 <h3>Total Services</h3>
-                <span class="stat-number">{analytics['summary'].get('total_services', 0)}</span>
-                <span class="stat-period">{analytics['summary'].get('first_service', '')[:4]} - {analytics['summary'].get('last_service', '')[:4]}</span>
+                <span class="stat-number">{summary.get('total_services', 0)}</span>
+                <span class="stat-period">{summary.get('first_service', '')[:4]} - {summary.get('last_service', '')[:4]}</span>
             </div>
             <div class="stat-card">
                 <h3>Total Cost</h3>
-                <span class="stat-number">€{analytics['summary'].get('total_cost', 0):,.2f}</span>
+                <span class="stat-number">€{summary.get('total_cost', 0):,.2f}</span>
                 <span class="stat-period">Maintenance only</span>
             </div>
             <div class="stat-card">
                 <h3>Average Annual</h3>
-                <span class="stat-number">€{analytics['summary'].get('total_cost', 0) / max(analytics['summary'].get('years_span', 1), 1):,.0f}</span>
+                <span class="stat-number">€{summary.get('total_cost', 0) / max(summary.get('years_span', 1), 1):,.0f}</span>
                 <span class="stat-period">Per year</span>
             </div>
             <div class="stat-card">
                 <h3>Cost per km</h3>
-                <span class="stat-number">€{analytics['summary'].get('cost_per_km', 0):.3f}</span>
+                <span class="stat-number">€{summary.get('cost_per_km', 0):.3f}</span>
                 <span class="stat-period">Maintenance</span>
             </div>
         </section>
@@ -568,31 +930,12 @@ class ServiceHistorySiteManager:
                         </tr>
                     </thead>
                     <tbody>
-"""
+"""]
         
-        # Add service rows
-        for service in reversed(self.service_data):  # Most recent first
-            odometer = f"{service.get('odometer_km'):,} km" if service.get('odometer_km') else "N/A"
-            amount = f"€{service.get('amount'):,.2f}" if service.get('amount') else "N/A"
-            invoice = service.get('invoice_number', 'N/A')
-            
-            # Check if this service has overrides
-            override_info = service.get('verified_data', {}).get('override_info', {})
-            has_overrides = override_info.get('has_overrides', False)
-            override_indicator = ' 🔧' if has_overrides else ''
-            row_class = 'clickable-row has-overrides' if has_overrides else 'clickable-row'
-            
-            html_content += f"""
-                        <tr onclick="openReceipt('{service['date']}')" class="{row_class}" title="{'Has manual corrections' if has_overrides else ''}">
-                            <td>{service['date']}{override_indicator}</td>
-                            <td>{service.get('company', 'Unknown')}</td>
-                            <td>{odometer}</td>
-                            <td>{amount}</td>
-                            <td>{invoice}</td>
-                            <td class="source-file">{service['original_filename']}</td>
-                        </tr>"""
+        # Add service rows, most recent first
+        parts.extend(SERVICE_ROW_TEMPLATE % service for service in reversed(self.service_data))
         
-        html_content += """
+        parts.append(f"""
                     </tbody>
                 </table>
             </div>
@@ -603,50 +946,153 @@ class ServiceHistorySiteManager:
         <p>Generated by Car Service History Tool | Data from verified receipts</p>
     </footer>
 
-    <script src="assets/script.js"></script>
+    <script src="assets/{self.asset_url('script.js')}"></script>
     <script>
-        // Load analytics data and initialize charts
-        const analyticsData = """ + json.dumps(analytics) + """;
+        // Load analytics data and initialize charts{receipt_links}
+        const analyticsData = {analytics_json};
         initializeCharts(analyticsData);
     </script>
 </body>
-</html>"""
+</html>""")
         
-        with open(f"{self.site_dir}index.html", "w", encoding='utf-8') as f:
-            f.write(html_content)
+        write_parts(f"{self.site_dir}index.html", parts)
 
     def generate_receipt_pages(self):
         """Generate individual receipt detail pages"""
         print("📄 Generating receipt detail pages...")
         
-        for service in self.service_data:
-            date = service['date']
-            
-            # Check if OCR data exists
-            ocr_file = f"{self.site_dir}data/ocr/{date}.txt"
-            ocr_content = ""
-            if os.path.exists(ocr_file):
-                with open(ocr_file, 'r', encoding='utf-8') as f:
-                    ocr_content = f.read()
-            
-            extraction_data = service.get('extraction_data', {})
-            
-            # Get override information
-            override_info = service.get('verified_data', {}).get('override_info', {})
-            has_overrides = override_info.get('has_overrides', False)
-            overridden_fields = override_info.get('overridden_fields', {})
-            override_reason = override_info.get('reason')
+        single_page_path = f"{self.site_dir}receipts/all.html"
+        manifest_path = f"{self.site_dir}.build-manifest.json"
+        
+        if self.single_page:
+            # One streamed file instead of a file per receipt
+            write_parts(single_page_path, self.render_single_receipt_page())
             
-            html_content = f"""<!DOCTYPE html>
+            # Drop per-receipt pages left by earlier builds so they are not served or packaged
+            with os.scandir(f"{self.site_dir}receipts") as entries:
+                for entry in entries:
+                    if entry.name.endswith('.html') and entry.name != 'all.html':
+                        os.unlink(entry.path)
+            try:
+                os.unlink(manifest_path)
+            except FileNotFoundError:
+                pass
+            return
+        
+        try:
+            os.unlink(single_page_path)
+        except FileNotFoundError:
+            pass
+        
+        # Skip pages whose inputs match the previous build (site/.build-manifest.json)
+        try:
+            previous = load_json(manifest_path)
+        except (FileNotFoundError, ValueError):
+            previous = {}
+        
+        # One page per date; a later record with the same date replaces the earlier one
+        pages = {service['date']: service for service in self.service_data}
+        
+        manifest = {}
+        jobs = []
+        for date, service in pages.items():
+            # The page also embeds its OCR text file, so track that file's mtime
+            try:
+                ocr_mtime_ns = os.stat(f"{self.site_dir}data/ocr/{date}.txt").st_mtime_ns
+            except FileNotFoundError:
+                ocr_mtime_ns = None
+            page_hash = hashlib.sha256(
+                json.dumps([RENDER_VERSION, self.asset_names, ocr_mtime_ns, service],
+                           sort_keys=True, default=str).encode('utf-8')
+            ).hexdigest()
+            manifest[date] = page_hash
+            if previous.get(date) == page_hash and os.path.exists(f"{self.site_dir}receipts/{date}.html"):
+                continue
+            jobs.append(service)
+        
+        skipped = len(pages) - len(jobs)
+        if skipped:
+            print(f"⏭️  {skipped} unchanged receipt pages skipped (use --force to rebuild all)")
+        
+        # Pages are independent and CPU-bound, but a process pool only pays off for larger batches
+        if len(jobs) >= PARALLEL_RENDER_MIN_PAGES and (os.cpu_count() or 1) > 1:
+            with ProcessPoolExecutor(initializer=_init_render_worker,
+                                     initargs=(self.site_dir, self.asset_names)) as executor:
+                list(executor.map(_render_receipt, jobs, chunksize=4))
+        else:
+            for service in jobs:
+                self.write_receipt_page(service)
+        
+        write_json(manifest_path, manifest)
+
+    def write_receipt_page(self, service):
+        """Render and write one receipt detail page"""
+        # Fragments are written as they are rendered, never joined into one page string
+        write_parts(f"{self.site_dir}receipts/{service['date']}.html", self.render_receipt_page(service))
+
+    def render_receipt_page(self, service):
+        """Yield the HTML fragments of one receipt detail page"""
+        yield self.receipt_page_head(f"Service Record: {service['date']}")
+        yield from self.render_receipt_body(service)
+        yield RECEIPT_PAGE_END
+
+    def render_single_receipt_page(self):
+        """Yield the HTML fragments of a page holding every receipt, one section each"""
+        yield self.receipt_page_head("Service Records")
+        for service in self.service_data:
+            yield f"""<section class="receipt-section" id="{service['_receipt_key']}">
+"""
+            yield from self.render_receipt_body(service)
+            yield """
+</section>
+"""
+        yield """</body>
+</html>"""
+
+    def render_pdf_viewer(self, date):
+        """Return the PDF viewer markup; the single page links to PDFs instead of embedding each one"""
+        if self.single_page:
+            return f"""            <div class="pdf-fallback">
+                <p><a href="../pdfs/{date}.pdf" target="_blank">Open PDF</a></p>
+            </div>"""
+        return f"""            <embed src="../pdfs/{date}.pdf" type="application/pdf" width="100%" height="800px">
+            <div class="pdf-fallback">
+                <p>PDF viewer not supported. <a href="../pdfs/{date}.pdf" target="_blank">Download PDF</a></p>
+            </div>"""
+
+    def receipt_page_head(self, title):
+        """Return the document head shared by the receipt pages"""
+        return f"""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Service Record: {date}</title>
-    <link rel="stylesheet" href="../assets/style.css">
+    <title>{title}</title>
+    <link rel="stylesheet" href="../assets/{self.asset_url('style.css')}">
 </head>
 <body>
-    <header class="receipt-header">
+"""
+
+    def render_receipt_body(self, service):
+        """Yield the header and detail sections for one receipt"""
+        date = service['date']
+        
+        # Check if OCR data exists
+        ocr_file = f"{self.site_dir}data/ocr/{date}.txt"
+        ocr_content = ""
+        if os.path.exists(ocr_file):
+            with open(ocr_file, 'r', encoding='utf-8', errors='replace') as f:
+                ocr_content = f.read()
+        
+        extraction_data = service.get('extraction_data', {})
+        
+        # Get override information
+        override_info = service.get('override_info', {})
+        has_overrides = override_info.get('has_overrides', False)
+        overridden_fields = override_info.get('overridden_fields', {})
+        override_reason = override_info.get('reason')
+        
+        yield f"""    <header class="receipt-header">
         <div class="container">
             <a href="../index.html" class="back-link">← Back to Service History</a>
             <h1>Service Record: {date}</h1>
@@ -659,823 +1105,80 @@ class ServiceHistorySiteManager:
 
     <main class="receipt-detail">
         <div class="pdf-viewer">
-            <embed src="../pdfs/{date}.pdf" type="application/pdf" width="100%" height="800px">
-            <div class="pdf-fallback">
-                <p>PDF viewer not supported. <a href="../pdfs/{date}.pdf" target="_blank">Download PDF</a></p>
-            </div>
+{self.render_pdf_viewer(date)}
         </div>
 
         <div class="extraction-details">"""
-            
-            # Add override banner if there are overrides
-            if has_overrides:
-                override_fields_count = len(overridden_fields)
-                html_content += f"""
+        
+        # Add override banner if there are overrides
+        if has_overrides:
+            override_fields_count = len(overridden_fields)
+            yield f"""
             <div class="override-banner">
                 ⚠️ This receipt contains manually corrected data
                 <details class="override-details">
                     <summary>View corrections ({override_fields_count} field{'s' if override_fields_count != 1 else ''})</summary>"""
-                
-                if override_reason:
-                    html_content += f"""
-                    <p><strong>Reason:</strong> {override_reason}</p>"""
-                
-                html_content += """
-                    <ul>"""
-                
-                for field, values in overridden_fields.items():
-                    original = values.get('original', 'None')
-                    override = values.get('override', 'None')
-                    html_content += f"""
-                        <li><strong>{field}:</strong> {original} → {override}</li>"""
-                
-                html_content += """
-                    </ul>
-                </details>
-            </div>"""
-            
-            
-            # Generate verified data section with proper formatting
-            html_content += """
-            <div class="verified-data">
-                <h2>Verified Service Data</h2>
-                <div class="field-grid">"""
-            
-            # Generate each field with proper conditional formatting
-            fields = [
-                ('Date', 'date', service.get('date', 'N/A')),
-                ('Company', 'company', service.get('company', 'N/A')),
-                ('Amount', 'amount', f"€{service.get('amount'):,.2f}" if service.get('amount') else "N/A"),
-                ('VAT Amount', 'vat_amount', f"€{service.get('vat_amount'):,.2f}" if service.get('vat_amount') else "N/A"),
-                ('Odometer', 'odometer_km', f"{service.get('odometer_km'):,} km" if service.get('odometer_km') else "N/A"),
-                ('Invoice Number', 'invoice_number', service.get('invoice_number', 'N/A'))
-            ]
             
-            for field_label, field_key, field_value in fields:
-                field_class = ' field-overridden' if field_key in overridden_fields else ''
-                override_badge = ' <span class="override-badge">Fixed</span>' if field_key in overridden_fields else ''
-                
-                html_content += f"""
-                    <div class="field-item{field_class}">
-                        <label>{field_label}:{override_badge}</label>
-                        <span>{field_value}</span>
-                    </div>"""
-            
-            html_content += """
-                </div>
-            </div>
-"""
+            if override_reason:
+                yield f"""
+                    <p><strong>Reason:</strong> {override_reason}</p>"""
             
-            if ocr_content:
-                html_content += f"""
+            yield OVERRIDE_LIST_START
+            yield from (f"""
+                        <li><strong>{field}:</strong> {values.get('original', 'None')} → {values.get('override', 'None')}</li>"""
+                for field, values in overridden_fields.items())
+            yield OVERRIDE_BANNER_END
+        else:
+            yield VERIFIED_DATA_START
+        
+        # Generate each field, marking the ones corrected by override.json
+        for field_label, field_key, value_key in RECEIPT_FIELDS:
+            yield render_field(field_label, service.get(value_key, 'N/A'), field_key in overridden_fields)
+        
+        yield VERIFIED_DATA_END
+        
+        if ocr_content:
+            yield f"""
             <details class="ocr-section">
                 <summary>Raw OCR Text ({len(ocr_content)} characters)</summary>
                 <pre class="ocr-text">{ocr_content}</pre>
             </details>
 """
-            
-            if extraction_data:
-                processing_steps = extraction_data.get('processing_steps', [])
-                if processing_steps:
-                    html_content += """
-            <details class="processing-steps">
-                <summary>Processing Details</summary>
-                <div class="steps-list">
-"""
-                    for step in processing_steps:
-                        step_name = step.get('step_name', 'unknown')
-                        duration = step.get('duration_ms', 0)
-                        html_content += f"""
+        
+        if extraction_data:
+            processing_steps = extraction_data.get('processing_steps', [])
+            if processing_steps:
+                yield PROCESSING_STEPS_START
+                yield from (f"""
                     <div class="step-item">
-                        <strong>{step_name.title()}:</strong> {duration}ms
+                        <strong>{step.get('step_name', 'unknown').title()}:</strong> {step.get('duration_ms', 0)}ms
                     </div>
 """
-                    html_content += """
-                </div>
-            </details>
-"""
-            
-            html_content += """
-        </div>
-    </main>
-</body>
-</html>"""
-            
-            with open(f"{self.site_dir}receipts/{date}.html", "w", encoding='utf-8') as f:
-                f.write(html_content)
+                    for step in processing_steps)
+                yield PROCESSING_STEPS_END
+        
+        yield RECEIPT_BODY_END
 
     def copy_static_assets(self):
         """Copy CSS, JS and other static assets"""
         print("🎨 Creating static assets...")
         
-        # Create CSS
-        css_content = """
-/* Car Service History Site Styles */
-
-* {
-    margin: 0;
-    padding: 0;
-    box-sizing: border-box;
-}
-
-body {
-    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-    line-height: 1.6;
-    color: #333;
-    background-color: #f8f9fa;
-}
-
-.container {
-    max-width: 1200px;
-    margin: 0 auto;
-    padding: 0 20px;
-}
-
-/* Header */
-.site-header {
-    background: linear-gradient(135deg, #2c3e50, #3498db);
-    color: white;
-    padding: 2rem 0;
-}
-
-.car-info {
-    display: flex;
-    align-items: center;
-    gap: 2rem;
-}
-
-.car-image-placeholder {
-    width: 100px;
-    height: 70px;
-    background: rgba(255,255,255,0.1);
-    border-radius: 8px;
-    display: flex;
-    align-items: center;
-    justify-content: center;
-    position: relative;
-}
-
-.car-image-placeholder img {
-    max-width: 100%;
-    max-height: 100%;
-    border-radius: 8px;
-}
-
-.car-image-fallback {
-    font-size: 2rem;
-}
-
-.car-details h1 {
-    font-size: 2.5rem;
-    margin-bottom: 0.5rem;
-}
-
-.car-specs {
-    opacity: 0.9;
-    font-size: 1.1rem;
-}
-
-/* Summary Cards */
-.summary-cards {
-    display: grid;
-    grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-    gap: 1.5rem;
-    margin: 2rem 0;
-}
-
-.stat-card {
-    background: white;
-    padding: 1.5rem;
-    border-radius: 12px;
-    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-    text-align: center;
-    transition: transform 0.2s;
-}
-
-.stat-card:hover {
-    transform: translateY(-2px);
-}
-
-.stat-card h3 {
-    color: #666;
-    font-size: 0.9rem;
-    text-transform: uppercase;
-    letter-spacing: 0.5px;
-    margin-bottom: 0.5rem;
-}
-
-.stat-number {
-    font-size: 2rem;
-    font-weight: bold;
-    color: #2c3e50;
-    display: block;
-    margin-bottom: 0.25rem;
-}
-
-.stat-period {
-    font-size: 0.8rem;
-    color: #888;
-}
-
-/* Analytics Sections */
-.analytics-section {
-    background: white;
-    margin: 2rem 0;
-    padding: 2rem;
-    border-radius: 12px;
-    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-}
-
-.analytics-section h2 {
-    margin-bottom: 1.5rem;
-    color: #2c3e50;
-}
-
-.chart-container {
-    position: relative;
-    height: 400px;
-    margin-bottom: 1rem;
-}
-
-.chart-controls {
-    text-align: center;
-    margin-top: 1rem;
-}
-
-.chart-controls label {
-    margin: 0 1rem;
-    cursor: pointer;
-}
-
-.dual-chart-container {
-    display: grid;
-    grid-template-columns: 1fr 1fr;
-    gap: 2rem;
-}
-
-.chart-half {
-    text-align: center;
-}
-
-.chart-half canvas {
-    max-height: 300px;
-}
-
-.chart-half h4 {
-    margin-top: 1rem;
-    color: #666;
-}
-
-/* Fuel methodology */
-.fuel-methodology {
-    margin-top: 1.5rem;
-}
-
-.fuel-methodology details {
-    background: #f8f9fa;
-    padding: 1rem;
-    border-radius: 8px;
-}
-
-.fuel-methodology summary {
-    cursor: pointer;
-    font-weight: 500;
-    color: #666;
-}
-
-.fuel-methodology ul {
-    margin-top: 1rem;
-    margin-left: 1rem;
-}
-
-.fuel-methodology li {
-    margin-bottom: 0.5rem;
-}
-
-/* Service History Table */
-.service-history {
-    background: white;
-    margin: 2rem 0;
-    padding: 2rem;
-    border-radius: 12px;
-    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-}
-
-.table-container {
-    overflow-x: auto;
-}
-
-.service-table {
-    width: 100%;
-    border-collapse: collapse;
-    margin-top: 1rem;
-}
-
-.service-table th {
-    background: #f8f9fa;
-    padding: 1rem;
-    text-align: left;
-    border-bottom: 2px solid #dee2e6;
-    cursor: pointer;
-    user-select: none;
-}
-
-.service-table th:hover {
-    background: #e9ecef;
-}
-
-.service-table td {
-    padding: 1rem;
-    border-bottom: 1px solid #dee2e6;
-}
-
-.clickable-row {
-    cursor: pointer;
-    transition: background-color 0.2s;
-}
-
-.clickable-row:hover {
-    background-color: #f8f9fa;
-}
-
-.source-file {
-    font-family: monospace;
-    font-size: 0.8rem;
-    color: #666;
-}
-
-/* Receipt Detail Pages */
-.receipt-header {
-    background: #2c3e50;
-    color: white;
-    padding: 1.5rem 0;
-}
-
-.back-link {
-    color: white;
-    text-decoration: none;
-    display: inline-block;
-    margin-bottom: 1rem;
-}
-
-.back-link:hover {
-    text-decoration: underline;
-}
-
-.file-info {
-    margin-top: 1rem;
-    font-size: 0.9rem;
-    opacity: 0.8;
-}
-
-.original-file,
-.renamed-file {
-    display: block;
-    margin-bottom: 0.25rem;
-}
-
-.receipt-detail {
-    display: grid;
-    grid-template-columns: 1fr 400px;
-    gap: 2rem;
-    margin: 2rem auto;
-    max-width: 1400px;
-    padding: 0 20px;
-}
-
-.pdf-viewer {
-    background: white;
-    border-radius: 8px;
-    overflow: hidden;
-    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-}
-
-.pdf-fallback {
-    padding: 2rem;
-    text-align: center;
-    color: #666;
-}
-
-.extraction-details {
-    background: white;
-    padding: 2rem;
-    border-radius: 8px;
-    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-    height: fit-content;
-}
-
-.field-grid {
-    display: grid;
-    gap: 1rem;
-    margin-top: 1rem;
-}
-
-.field-item {
-    display: flex;
-    justify-content: space-between;
-    align-items: center;
-    padding: 0.75rem;
-    background: #f8f9fa;
-    border-radius: 6px;
-}
-
-.field-item label {
-    font-weight: 500;
-    color: #666;
-}
-
-.ocr-section,
-.processing-steps {
-    margin-top: 2rem;
-}
-
-.ocr-section details,
-.processing-steps details {
-    background: #f8f9fa;
-    padding: 1rem;
-    border-radius: 8px;
-}
-
-.ocr-section summary,
-.processing-steps summary {
-    cursor: pointer;
-    font-weight: 500;
-    margin-bottom: 1rem;
-}
-
-.ocr-text {
-    font-family: monospace;
-    font-size: 0.8rem;
-    line-height: 1.4;
-    background: white;
-    padding: 1rem;
-    border-radius: 6px;
-    max-height: 300px;
-    overflow-y: auto;
-}
-
-.steps-list {
-    margin-top: 1rem;
-}
-
-.step-item {
-    padding: 0.5rem;
-    margin-bottom: 0.5rem;
-    background: white;
-    border-radius: 6px;
-}
-
-/* Override Indicators */
-.has-overrides {
-    border-left: 3px solid #f39c12;
-}
-
-.override-indicator {
-    font-size: 0.9em;
-    margin-left: 4px;
-    opacity: 0.8;
-}
-
-.field-overridden {
-    background-color: #fff3cd;
-    border-left: 3px solid #f39c12;
-}
-
-.override-banner {
-    background: #fff3cd;
-    border: 1px solid #f39c12;
-    padding: 1rem;
-    border-radius: 6px;
-    margin-bottom: 1rem;
-    color: #856404;
-}
-
-.override-banner details {
-    margin-top: 0.5rem;
-}
-
-.override-banner summary {
-    cursor: pointer;
-    font-weight: 500;
-}
-
-.override-banner ul {
-    margin-top: 0.5rem;
-    margin-left: 1rem;
-}
-
-.override-badge {
-    background: #f39c12;
-    color: white;
-    font-size: 0.7rem;
-    padding: 2px 6px;
-    border-radius: 3px;
-    margin-left: 4px;
-    font-weight: normal;
-}
-
-/* Footer */
-footer {
-    text-align: center;
-    padding: 2rem;
-    color: #666;
-    border-top: 1px solid #dee2e6;
-    margin-top: 3rem;
-}
-
-/* Responsive */
-@media (max-width: 768px) {
-    .car-info {
-        flex-direction: column;
-        text-align: center;
-    }
-    
-    .dual-chart-container {
-        grid-template-columns: 1fr;
-    }
-    
-    .receipt-detail {
-        grid-template-columns: 1fr;
-    }
-    
-    .summary-cards {
-        grid-template-columns: 1fr;
-    }
-}
-"""
+        # CSS and JavaScript live as plain files under templates/
+        with open(f"{self.templates_dir}style.css", encoding='utf-8') as f:
+            css_content = f.read()
         
-        with open(f"{self.site_dir}assets/style.css", "w", encoding='utf-8') as f:
-            f.write(css_content)
+        if cssmin is not None:
+            css_content = cssmin(css_content)
         
-        # Create JavaScript
-        js_content = """
-// Car Service History Site Scripts
-
-let maintenanceChart = null;
-let mileageChart = null;
-let fuelChart = null;
-
-function initializeCharts(analyticsData) {
-    createMaintenanceChart(analyticsData.maintenance);
-    createMileageChart(analyticsData.mileage);
-    createFuelChart(analyticsData.fuel);
-    
-    // Add chart controls
-    setupChartControls();
-}
-
-function createMaintenanceChart(maintenanceData) {
-    const ctx = document.getElementById('maintenanceChart').getContext('2d');
-    
-    const years = Object.keys(maintenanceData.yearly_costs).sort();
-    const yearlyCosts = years.map(year => maintenanceData.yearly_costs[year]);
-    const movingAverage = years.map(year => maintenanceData.moving_average_3yr[year] || null);
-    
-    maintenanceChart = new Chart(ctx, {
-        type: 'line',
-        data: {
-            labels: years,
-            datasets: [
-                {
-                    label: 'Annual Cost (€)',
-                    data: yearlyCosts,
-                    borderColor: '#e74c3c',
-                    backgroundColor: 'rgba(231, 76, 60, 0.1)',
-                    fill: true,
-                    tension: 0.1,
-                    pointBackgroundColor: '#e74c3c',
-                    pointBorderColor: '#c0392b',
-                    pointRadius: 5
-                },
-                {
-                    label: '3-Year Moving Average (€)',
-                    data: movingAverage,
-                    borderColor: '#3498db',
-                    backgroundColor: 'transparent',
-                    borderWidth: 3,
-                    fill: false,
-                    tension: 0.1,
-                    pointBackgroundColor: '#3498db',
-                    pointBorderColor: '#2980b9',
-                    pointRadius: 4
-                }
-            ]
-        },
-        options: {
-            responsive: true,
-            maintainAspectRatio: false,
-            scales: {
-                y: {
-                    beginAtZero: true,
-                    ticks: {
-                        callback: function(value) {
-                            return '€' + value.toLocaleString();
-                        }
-                    }
-                }
-            },
-            plugins: {
-                legend: {
-                    display: true,
-                    position: 'top'
-                },
-                tooltip: {
-                    mode: 'index',
-                    intersect: false,
-                    callbacks: {
-                        label: function(context) {
-                            return context.dataset.label + ': €' + context.parsed.y.toLocaleString();
-                        }
-                    }
-                }
-            },
-            interaction: {
-                mode: 'nearest',
-                axis: 'x',
-                intersect: false
-            }
-        }
-    });
-}
-
-function createMileageChart(mileageData) {
-    const ctx = document.getElementById('mileageChart').getContext('2d');
-    
-    const years = Object.keys(mileageData.yearly).sort();
-    const yearlyKm = years.map(year => mileageData.yearly[year]);
-    
-    mileageChart = new Chart(ctx, {
-        type: 'bar',
-        data: {
-            labels: years,
-            datasets: [{
-                label: 'km/year',
-                data: yearlyKm,
-                backgroundColor: '#27ae60',
-                borderColor: '#229954',
-                borderWidth: 1
-            }]
-        },
-        options: {
-            responsive: true,
-            maintainAspectRatio: false,
-            scales: {
-                y: {
-                    beginAtZero: true,
-                    ticks: {
-                        callback: function(value) {
-                            return value.toLocaleString() + ' km';
-                        }
-                    }
-                }
-            },
-            plugins: {
-                legend: {
-                    display: false
-                },
-                tooltip: {
-                    callbacks: {
-                        label: function(context) {
-                            return context.parsed.y.toLocaleString() + ' km';
-                        }
-                    }
-                }
-            }
-        }
-    });
-}
-
-function createFuelChart(fuelData) {
-    const ctx = document.getElementById('fuelChart').getContext('2d');
-    
-    const years = Object.keys(fuelData).sort();
-    const fuelCosts = years.map(year => fuelData[year]);
-    
-    fuelChart = new Chart(ctx, {
-        type: 'bar',
-        data: {
-            labels: years,
-            datasets: [{
-                label: 'Estimated €/year',
-                data: fuelCosts,
-                backgroundColor: '#f39c12',
-                borderColor: '#e67e22',
-                borderWidth: 1
-            }]
-        },
-        options: {
-            responsive: true,
-            maintainAspectRatio: false,
-            scales: {
-                y: {
-                    beginAtZero: true,
-                    ticks: {
-                        callback: function(value) {
-                            return '€' + value.toLocaleString();
-                        }
-                    }
-                }
-            },
-            plugins: {
-                legend: {
-                    display: false
-                },
-                tooltip: {
-                    callbacks: {
-                        label: function(context) {
-                            return 'Est. €' + context.parsed.y.toLocaleString();
-                        }
-                    }
-                }
-            }
-        }
-    });
-}
-
-function setupChartControls() {
-    const absoluteCheckbox = document.getElementById('showAbsolute');
-    const movingAvgCheckbox = document.getElementById('showMovingAvg');
-    
-    if (absoluteCheckbox && movingAvgCheckbox && maintenanceChart) {
-        absoluteCheckbox.addEventListener('change', function() {
-            maintenanceChart.data.datasets[0].hidden = !this.checked;
-            maintenanceChart.update();
-        });
-        
-        movingAvgCheckbox.addEventListener('change', function() {
-            maintenanceChart.data.datasets[1].hidden = !this.checked;
-            maintenanceChart.update();
-        });
-    }
-}
-
-function openReceipt(date) {
-    window.location.href = `receipts/${date}.html`;
-}
-
-// Table sorting functionality
-let sortDirection = {};
-
-function sortTable(columnIndex) {
-    const table = document.getElementById('serviceTable');
-    const tbody = table.getElementsByTagName('tbody')[0];
-    const rows = Array.from(tbody.getElementsByTagName('tr'));
-    
-    const isNumeric = columnIndex === 2 || columnIndex === 3; // Odometer or Cost
-    const isDate = columnIndex === 0;
-    
-    // Toggle sort direction
-    sortDirection[columnIndex] = sortDirection[columnIndex] === 'asc' ? 'desc' : 'asc';
-    
-    rows.sort((a, b) => {
-        let aValue = a.cells[columnIndex].textContent.trim();
-        let bValue = b.cells[columnIndex].textContent.trim();
-        
-        if (isDate) {
-            aValue = new Date(aValue);
-            bValue = new Date(bValue);
-        } else if (isNumeric) {
-            aValue = parseFloat(aValue.replace(/[€,km\\s]/g, '')) || 0;
-            bValue = parseFloat(bValue.replace(/[€,km\\s]/g, '')) || 0;
-        }
+        self.write_fingerprinted_asset("style.css", css_content)
         
-        if (aValue < bValue) return sortDirection[columnIndex] === 'asc' ? -1 : 1;
-        if (aValue > bValue) return sortDirection[columnIndex] === 'asc' ? 1 : -1;
-        return 0;
-    });
-    
-    // Clear tbody and append sorted rows
-    while (tbody.firstChild) {
-        tbody.removeChild(tbody.firstChild);
-    }
-    
-    rows.forEach(row => tbody.appendChild(row));
-    
-    // Update header indicators
-    updateSortIndicators(columnIndex);
-}
-
-function updateSortIndicators(activeColumn) {
-    const headers = document.querySelectorAll('#serviceTable th');
-    headers.forEach((header, index) => {
-        const text = header.textContent.replace(/[↑↓]/g, '').trim();
-        if (index === activeColumn) {
-            header.textContent = text + (sortDirection[activeColumn] === 'asc' ? ' ↑' : ' ↓');
-        } else {
-            header.textContent = text;
-        }
-    });
-}
-
-// Initialize when DOM is ready
-document.addEventListener('DOMContentLoaded', function() {
-    // Any additional initialization can go here
-    console.log('Car Service History site loaded');
-});
-"""
+        with open(f"{self.templates_dir}script.js", encoding='utf-8') as f:
+            js_content = f.read()
         
-        with open(f"{self.site_dir}assets/script.js", "w", encoding='utf-8') as f:
-            f.write(js_content)
+        if jsmin is not None:
+            js_content = jsmin(js_content)
+        
+        self.write_fingerprinted_asset("script.js", js_content)
         
         # Create placeholder car image (simple SVG)
         placeholder_svg = """<svg width="100" height="70" xmlns="http://www.w3.org/2000/svg">
@@ -1483,8 +1186,48 @@ document.addEventListener('DOMContentLoaded', function() {
   <text x="50" y="40" font-family="Arial" font-size="24" fill="white" text-anchor="middle">🚗</text>
 </svg>"""
         
-        with open(f"{self.site_dir}assets/car-placeholder.svg", "w", encoding='utf-8') as f:
-            f.write(placeholder_svg)
+        self.write_fingerprinted_asset("car-placeholder.svg", placeholder_svg)
+        
+        # Serve Chart.js from the site itself when a vendored copy is available
+        chart_path = f"{self.vendor_dir}chart.min.js"
+        if os.path.exists(chart_path):
+            with open(chart_path, encoding='utf-8', newline='') as f:
+                chart_content = f.read()
+            self.write_fingerprinted_asset("chart.min.js", chart_content)
+            digest = hashlib.sha384(chart_content.encode('utf-8')).digest()
+            self.chart_js_integrity = f"sha384-{base64.b64encode(digest).decode('ascii')}"
+        
+        # Map logical names to fingerprinted files for anything outside the generator
+        write_json(f"{self.site_dir}assets/manifest.json", self.asset_names)
+        
+        self.remove_stale_assets()
+
+    def write_fingerprinted_asset(self, name, content):
+        """Write an asset under a content-hashed name so it can be cached forever"""
+        stem, ext = os.path.splitext(name)
+        digest = hashlib.sha1(content.encode('utf-8')).hexdigest()[:8]
+        fingerprinted = f"{stem}.{digest}{ext}"
+        write_asset(f"{self.site_dir}assets/{fingerprinted}", content)
+        self.asset_names[name] = fingerprinted
+
+    def remove_stale_assets(self):
+        """Delete fingerprinted assets (and their .gz/.br copies) left over from earlier builds"""
+        current = set(self.asset_names.values())
+        with os.scandir(f"{self.site_dir}assets") as entries:
+            for entry in entries:
+                match = FINGERPRINTED_ASSET_RE.match(entry.name)
+                if match and match.group(1) not in current:
+                    os.unlink(entry.path)
+
+    def chart_js_tag(self):
+        """Return the Chart.js script tag, preferring the local vendored copy"""
+        if self.chart_js_integrity:
+            return f'<script src="assets/{self.asset_url("chart.min.js")}" integrity="{self.chart_js_integrity}"></script>'
+        return '<script src="https://cdn.jsdelivr.net/npm/chart.js"></script>'
+
+    def asset_url(self, name):
+        """Return the file name pages should use for a static asset"""
+        return self.asset_names.get(name, name)
 
     def serve_site(self, port=8000):
         """Serve the site locally"""
@@ -1494,8 +1237,7 @@ document.addEventListener('DOMContentLoaded', function() {
         
         os.chdir(self.site_dir)
         
-        handler = http.server.SimpleHTTPRequestHandler
-        with socketserver.TCPServer(("", port), handler) as httpd:
+        with http.server.ThreadingHTTPServer(("", port), PrecompressedRequestHandler) as httpd:
             print(f"🌐 Serving site at http://localhost:{port}")
             print("Press Ctrl+C to stop the server")
             try:
@@ -1503,6 +1245,32 @@ document.addEventListener('DOMContentLoaded', function() {
             except KeyboardInterrupt:
                 print("\n🛑 Server stopped")
 
+    def package_site(self, output="site.zip"):
+        """Bundle the generated site into a zip archive for distribution"""
+        if not os.path.exists(self.site_dir):
+            print(f"❌ Site directory {self.site_dir} does not exist. Run 'python site.py build' first.")
+            return False
+        
+        print(f"📦 Packaging {self.site_dir} into {output}...")
+        
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+            for root, dirs, files in os.walk(self.site_dir):
+                dirs.sort()
+                for name in sorted(files):
+                    # Build bookkeeping stays out of the bundle
+                    if name == ".build-manifest.json":
+                        continue
+                    path = os.path.join(root, name)
+                    arcname = os.path.relpath(path, self.site_dir)
+                    # Already-compressed files would only grow when deflated again
+                    if name.endswith(ALREADY_COMPRESSED_SUFFIXES):
+                        archive.write(path, arcname, compress_type=zipfile.ZIP_STORED)
+                    else:
+                        archive.write(path, arcname)
+        
+        print(f"✅ Wrote {output} ({os.path.getsize(output) / 1024:.0f} KB)")
+        return True
+
     def clean_site(self):
         """Clean generated site files"""
         if os.path.exists(self.site_dir):
@@ -1512,6 +1280,23 @@ document.addEventListener('DOMContentLoaded', function() {
             print(f"ℹ️  Site directory {self.site_dir} does not exist")
 
 
+# Per-worker manager used by _render_receipt, set up once by _init_render_worker
+_worker_manager = None
+
+
+def _init_render_worker(site_dir, asset_names):
+    """Create the manager a render worker process reuses for every page"""
+    global _worker_manager
+    _worker_manager = ServiceHistorySiteManager()
+    _worker_manager.site_dir = site_dir
+    _worker_manager.asset_names = asset_names
+
+
+def _render_receipt(service):
+    """Render and write one receipt page (runs in a worker process)"""
+    _worker_manager.write_receipt_page(service)
+
+
 def main():
     """Command-line interface"""
     parser = argparse.ArgumentParser(description="Car Service History Site Operations")
@@ -1520,6 +1305,8 @@ def main():
     # Build command
     build_parser = subparsers.add_parser('build', help='Generate complete static site')
     build_parser.add_argument('--force', action='store_true', help='Force rebuild even if site exists')
+    build_parser.add_argument('--single-page', action='store_true',
+                              help='Write all receipt details to receipts/all.html instead of one page each')
     
     # Serve command
     serve_parser = subparsers.add_parser('serve', help='Serve site locally')
@@ -1531,6 +1318,10 @@ def main():
     # Clean command
     clean_parser = subparsers.add_parser('clean', help='Clean generated files')
     
+    # Package command
+    package_parser = subparsers.add_parser('package', help='Bundle the generated site into a zip archive')
+    package_parser.add_argument('--output', default='site.zip', help='Archive path (default: site.zip)')
+    
     args = parser.parse_args()
     
     if not args.command:
@@ -1540,7 +1331,7 @@ def main():
     site_manager = ServiceHistorySiteManager()
     
     if args.command == 'build':
-        success = site_manager.build_site(force=args.force)
+        success = site_manager.build_site(force=args.force, single_page=args.single_page)
         sys.exit(0 if success else 1)
     elif args.command == 'serve':
         site_manager.serve_site(args.port)
@@ -1549,6 +1340,9 @@ def main():
         sys.exit(0 if success else 1)
     elif args.command == 'clean':
         site_manager.clean_site()
+    elif args.command == 'package':
+        success = site_manager.package_site(args.output)
+        sys.exit(0 if success else 1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,263 @@
+// Car Service History Site Scripts
+
+let maintenanceChart = null;
+let mileageChart = null;
+let fuelChart = null;
+
+function initializeCharts(analyticsData) {
+    createMaintenanceChart(analyticsData.maintenance);
+    createMileageChart(analyticsData.mileage);
+    createFuelChart(analyticsData.fuel);
+    
+    // Add chart controls
+    setupChartControls();
+}
+
+function createMaintenanceChart(maintenanceData) {
+    const ctx = document.getElementById('maintenanceChart').getContext('2d');
+    
+    const years = Object.keys(maintenanceData.yearly_costs).sort();
+    const yearlyCosts = years.map(year => maintenanceData.yearly_costs[year]);
+    const movingAverage = years.map(year => maintenanceData.moving_average_3yr[year] || null);
+    
+    maintenanceChart = new Chart(ctx, {
+        type: 'line',
+        data: {
+            labels: years,
+            datasets: [
+                {
+                    label: 'Annual Cost (€)',
+                    data: yearlyCosts,
+                    borderColor: '#e74c3c',
+                    backgroundColor: 'rgba(231, 76, 60, 0.1)',
+                    fill: true,
+                    tension: 0.1,
+                    pointBackgroundColor: '#e74c3c',
+                    pointBorderColor: '#c0392b',
+                    pointRadius: 5
+                },
+                {
+                    label: '3-Year Moving Average (€)',
+                    data: movingAverage,
+                    borderColor: '#3498db',
+                    backgroundColor: 'transparent',
+                    borderWidth: 3,
+                    fill: false,
+                    tension: 0.1,
+                    pointBackgroundColor: '#3498db',
+                    pointBorderColor: '#2980b9',
+                    pointRadius: 4
+                }
+            ]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            scales: {
+                y: {
+                    beginAtZero: true,
+                    ticks: {
+                        callback: function(value) {
+                            return '€' + value.toLocaleString();
+                        }
+                    }
+                }
+            },
+            plugins: {
+                legend: {
+                    display: true,
+                    position: 'top'
+                },
+                tooltip: {
+                    mode: 'index',
+                    intersect: false,
+                    callbacks: {
+                        label: function(context) {
+                            return context.dataset.label + ': €' + context.parsed.y.toLocaleString();
+                        }
+                    }
+                }
+            },
+            interaction: {
+                mode: 'nearest',
+                axis: 'x',
+                intersect: false
+            }
+        }
+    });
+}
+
+function createMileageChart(mileageData) {
+    const ctx = document.getElementById('mileageChart').getContext('2d');
+    
+    const years = Object.keys(mileageData.yearly).sort();
+    const yearlyKm = years.map(year => mileageData.yearly[year]);
+    
+    mileageChart = new Chart(ctx, {
+        type: 'bar',
+        data: {
+            labels: years,
+            datasets: [{
+                label: 'km/year',
+                data: yearlyKm,
+                backgroundColor: '#27ae60',
+                borderColor: '#229954',
+                borderWidth: 1
+            }]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            scales: {
+                y: {
+                    beginAtZero: true,
+                    ticks: {
+                        callback: function(value) {
+                            return value.toLocaleString() + ' km';
+                        }
+                    }
+                }
+            },
+            plugins: {
+                legend: {
+                    display: false
+                },
+                tooltip: {
+                    callbacks: {
+                        label: function(context) {
+                            return context.parsed.y.toLocaleString() + ' km';
+                        }
+                    }
+                }
+            }
+        }
+    });
+}
+
+function createFuelChart(fuelData) {
+    const ctx = document.getElementById('fuelChart').getContext('2d');
+    
+    const years = Object.keys(fuelData).sort();
+    const fuelCosts = years.map(year => fuelData[year]);
+    
+    fuelChart = new Chart(ctx, {
+        type: 'bar',
+        data: {
+            labels: years,
+            datasets: [{
+                label: 'Estimated €/year',
+                data: fuelCosts,
+                backgroundColor: '#f39c12',
+                borderColor: '#e67e22',
+                borderWidth: 1
+            }]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            scales: {
+                y: {
+                    beginAtZero: true,
+                    ticks: {
+                        callback: function(value) {
+                            return '€' + value.toLocaleString();
+                        }
+                    }
+                }
+            },
+            plugins: {
+                legend: {
+                    display: false
+                },
+                tooltip: {
+                    callbacks: {
+                        label: function(context) {
+                            return 'Est. €' + context.parsed.y.toLocaleString();
+                        }
+                    }
+                }
+            }
+        }
+    });
+}
+
+function setupChartControls() {
+    const absoluteCheckbox = document.getElementById('showAbsolute');
+    const movingAvgCheckbox = document.getElementById('showMovingAvg');
+    
+    if (absoluteCheckbox && movingAvgCheckbox && maintenanceChart) {
+        absoluteCheckbox.addEventListener('change', function() {
+            maintenanceChart.data.datasets[0].hidden = !this.checked;
+            maintenanceChart.update();
+        });
+        
+        movingAvgCheckbox.addEventListener('change', function() {
+            maintenanceChart.data.datasets[1].hidden = !this.checked;
+            maintenanceChart.update();
+        });
+    }
+}
+
+function openReceipt(date, receiptKey) {
+    window.location.href = window.singlePageReceipts
+        ? `receipts/all.html#${receiptKey}`
+        : `receipts/${date}.html`;
+}
+
+// Table sorting functionality
+let sortDirection = {};
+
+function sortTable(columnIndex) {
+    const table = document.getElementById('serviceTable');
+    const tbody = table.getElementsByTagName('tbody')[0];
+    const rows = Array.from(tbody.getElementsByTagName('tr'));
+    
+    const isNumeric = columnIndex === 2 || columnIndex === 3; // Odometer or Cost
+    const isDate = columnIndex === 0;
+    
+    // Toggle sort direction
+    sortDirection[columnIndex] = sortDirection[columnIndex] === 'asc' ? 'desc' : 'asc';
+    
+    rows.sort((a, b) => {
+        let aValue = a.cells[columnIndex].textContent.trim();
+        let bValue = b.cells[columnIndex].textContent.trim();
+        
+        if (isDate) {
+            aValue = new Date(aValue);
+            bValue = new Date(bValue);
+        } else if (isNumeric) {
+            aValue = parseFloat(aValue.replace(/[€,km\s]/g, '')) || 0;
+            bValue = parseFloat(bValue.replace(/[€,km\s]/g, '')) || 0;
+        }
+        
+        if (aValue < bValue) return sortDirection[columnIndex] === 'asc' ? -1 : 1;
+        if (aValue > bValue) return sortDirection[columnIndex] === 'asc' ? 1 : -1;
+        return 0;
+    });
+    
+    // Re-insert sorted rows in one batch to trigger a single reflow
+    const fragment = document.createDocumentFragment();
+    rows.forEach(row => fragment.appendChild(row));
+    tbody.appendChild(fragment);
+    
+    // Update header indicators
+    updateSortIndicators(columnIndex);
+}
+
+function updateSortIndicators(activeColumn) {
+    const headers = document.querySelectorAll('#serviceTable th');
+    headers.forEach((header, index) => {
+        const text = header.textContent.replace(/[↑↓]/g, '').trim();
+        if (index === activeColumn) {
+            header.textContent = text + (sortDirection[activeColumn] === 'asc' ? ' ↑' : ' ↓');
+        } else {
+            header.textContent = text;
+        }
+    });
+}
+
+// Initialize when DOM is ready
+document.addEventListener('DOMContentLoaded', function() {
+    // Any additional initialization can go here
+    console.log('Car Service History site loaded');
+});